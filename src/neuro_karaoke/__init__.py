@@ -1,9 +1,29 @@
-"""Core package for the NeuroKaraoke project."""
+"""Core package for the NeuroKaraoke project.
+
+The public classes are imported lazily (PEP 562): ``import neuro_karaoke`` is
+cheap, and using ``DemucsSeparator`` does not pull in the Yandex Music client
+(or the other way around).
+"""
 
 # pyright: reportMissingImports=false
 
-from .separation import DemucsSeparator, SeparationResult
-from .yandex_music_service import KaraokeLine, LyricsPayload, TrackChoice, YandexMusicService
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover - static analysis only.
+    from .separation import DemucsSeparator, SeparationResult
+    from .yandex_music_service import KaraokeLine, LyricsPayload, TrackChoice, YandexMusicService
+
+_LAZY_ATTRIBUTES = {
+    "DemucsSeparator": ".separation",
+    "SeparationResult": ".separation",
+    "YandexMusicService": ".yandex_music_service",
+    "TrackChoice": ".yandex_music_service",
+    "LyricsPayload": ".yandex_music_service",
+    "KaraokeLine": ".yandex_music_service",
+}
 
 __all__ = [
     "DemucsSeparator",
@@ -15,3 +35,15 @@ __all__ = [
 ]
 
 
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache on the package so the lookup only happens once.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -2,33 +2,82 @@
 
 from __future__ import annotations
 
+import mmap
 from io import BytesIO
 from pathlib import Path
-from typing import Tuple
+from typing import Iterator, Tuple
 
 import numpy as np
 import soundfile as sf
 
+try:
+    from numba import njit, prange  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency.
+    njit = None
 
-def _ensure_2d(audio: np.ndarray) -> np.ndarray:
-    if audio.ndim == 1:
-        return audio[:, None]
-    return audio
+# Frames per block when streaming stems; a stereo float32 block is 512 KiB.
+_BLOCK_FRAMES = 65536
 
 
-def _match_channels(audio: np.ndarray, target_channels: int) -> np.ndarray:
-    if audio.shape[1] == target_channels:
-        return audio
-    if audio.shape[1] == 1:
-        return np.repeat(audio, target_channels, axis=1)
-
-    # Fallback: truncate to target channels
-    return audio[:, :target_channels]
-
-
-def _trim_to_shortest(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    length = min(a.shape[0], b.shape[0])
-    return a[:length], b[:length]
+def _mix_block_numpy(
+    instrumental: np.ndarray,
+    vocals: np.ndarray,
+    vocal_gain: float,
+    scale: float,
+    out: np.ndarray,
+) -> float:
+    # Mono stems stay ``(N, 1)``: NumPy broadcasting expands them during the
+    # mix without materialising a copy per channel.
+    np.multiply(vocals, vocal_gain, out=vocals)
+    np.add(instrumental, vocals, out=out)
+    peak = max(float(out.max()), -float(out.min()))
+    if scale != 1.0:
+        np.multiply(out, scale, out=out)
+    return peak
+
+
+if njit is not None:
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _mix_block_numba(instrumental, vocals, vocal_gain, scale, out):  # pragma: no cover
+        mono_instrumental = instrumental.shape[1] == 1
+        mono_vocals = vocals.shape[1] == 1
+        peak = 0.0
+        for i in prange(out.shape[0]):
+            for c in range(out.shape[1]):
+                value = instrumental[i, 0 if mono_instrumental else c] + vocal_gain * vocals[
+                    i, 0 if mono_vocals else c
+                ]
+                peak = max(peak, abs(value))
+                out[i, c] = value * scale
+        return peak
+
+    _mix_block = _mix_block_numba
+else:
+    _mix_block = _mix_block_numpy
+
+
+def _iter_block_pairs(
+    instrumental: sf.SoundFile,
+    vocals: sf.SoundFile,
+    frames: int,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Both stems are decoded into the same pair of C-contiguous buffers for
+    # every block, so the mix always runs on dense rows and nothing is
+    # allocated per block.
+    size = min(_BLOCK_FRAMES, frames)
+    buffer_i = np.empty((size, instrumental.channels), dtype=np.float32)
+    buffer_v = np.empty((size, vocals.channels), dtype=np.float32)
+    instrumental.seek(0)
+    vocals.seek(0)
+    remaining = frames
+    while remaining > 0:
+        count = min(_BLOCK_FRAMES, remaining)
+        yield (
+            instrumental.read(out=buffer_i[:count]),
+            vocals.read(out=buffer_v[:count]),
+        )
+        remaining -= count
 
 
 def mix_stems(
@@ -36,28 +85,50 @@ def mix_stems(
     vocals_path: Path | str,
     vocal_gain: float,
 ) -> Tuple[BytesIO, int]:
-    """Combine instrumental + scaled vocals and return an in-memory WAV."""
-
-    instrumental, sr = sf.read(str(instrumental_path), dtype="float32")
-    vocals, sr_v = sf.read(str(vocals_path), dtype="float32")
-    if sr != sr_v:
-        raise ValueError("Sample rates do not match for provided stems")
-
-    instrumental = _ensure_2d(instrumental)
-    vocals = _ensure_2d(vocals)
-    instrumental, vocals = _trim_to_shortest(instrumental, vocals)
+    """Combine instrumental + scaled vocals and return an in-memory WAV.
+
+    The stems are streamed in blocks instead of being loaded whole: a first
+    pass finds the peak of the mix, the second one writes the (normalised)
+    result as 16-bit PCM. When Numba is installed each block is mixed by a
+    fused multi-threaded kernel, otherwise by in-place NumPy operations.
+    """
+
+    with sf.SoundFile(str(instrumental_path)) as instrumental, sf.SoundFile(
+        str(vocals_path)
+    ) as vocals:
+        if instrumental.samplerate != vocals.samplerate:
+            raise ValueError("Sample rates do not match for provided stems")
+
+        sr = instrumental.samplerate
+        channels = max(instrumental.channels, vocals.channels)
+        if instrumental.channels not in (1, channels) or vocals.channels not in (1, channels):
+            raise ValueError(
+                f"Cannot mix {instrumental.channels}-channel and "
+                f"{vocals.channels}-channel stems"
+            )
+        frames = min(instrumental.frames, vocals.frames)
+        mixed = np.empty((min(_BLOCK_FRAMES, frames), channels), dtype=np.float32)
+
+        peak = 0.0
+        for block_i, block_v in _iter_block_pairs(instrumental, vocals, frames):
+            out = mixed[: len(block_i)]
+            peak = max(peak, _mix_block(block_i, block_v, vocal_gain, 1.0, out))
+        scale = 1.0 / peak if peak > 1.0 else 1.0
+
+        buffer = BytesIO()
+        with sf.SoundFile(
+            buffer,
+            mode="w",
+            samplerate=sr,
+            channels=channels,
+            format="WAV",
+            subtype="PCM_16",
+        ) as output:
+            for block_i, block_v in _iter_block_pairs(instrumental, vocals, frames):
+                out = mixed[: len(block_i)]
+                _mix_block(block_i, block_v, vocal_gain, scale, out)
+                output.write(out)
 
-    channels = max(instrumental.shape[1], vocals.shape[1])
-    instrumental = _match_channels(instrumental, channels)
-    vocals = _match_channels(vocals, channels)
-
-    mixed = instrumental + vocal_gain * vocals
-    max_val = np.abs(mixed).max()
-    if max_val > 1.0:
-        mixed = mixed / max_val
-
-    buffer = BytesIO()
-    sf.write(buffer, mixed, sr, format="WAV")
     buffer.seek(0)
     return buffer, sr
 
@@ -67,5 +138,19 @@ def read_binary_audio(path: Path | str) -> bytes:
         return file.read()
 
 
-__all__ = ["mix_stems", "read_binary_audio"]
+def map_binary_audio(path: Path | str) -> mmap.mmap:
+    """Map ``path`` read-only into memory instead of copying it.
+
+    The mapping is bytes-like (``base64``, ``hashlib``, sockets and
+    ``memoryview`` accept it) and pages are loaded lazily by the OS, so large
+    stems do not need a private copy on the heap. Close the mapping (or use it
+    as a context manager) when done. Use :func:`read_binary_audio` for APIs
+    that insist on ``bytes`` such as ``st.download_button``.
+    """
+
+    with open(path, "rb") as file:
+        # The mapping keeps its own handle; closing the file is safe.
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
 
+__all__ = ["map_binary_audio", "mix_stems", "read_binary_audio"]
@@ -0,0 +1,297 @@
+"""Batched, streaming counterpart of :func:`demucs.apply.apply_model`.
+
+Demucs feeds overlapping segments to the model one at a time, which leaves a
+GPU mostly idle on short windows, and keeps every separated source in memory
+for the whole track before anything is written. The helpers below stack the
+segments into mini-batches before each forward pass and merge the predictions
+with the same triangular overlap-add weighting that Demucs uses. The merge
+only keeps a rolling window of a few segments: as soon as no upcoming segment
+can touch a region any more, that region is handed to the caller.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import math
+import random
+from typing import Iterator, Optional, Union
+
+import torch
+from demucs.apply import BagOfModels
+from demucs.htdemucs import HTDemucs
+from torch.nn import functional as F
+
+
+def iter_vectorized(
+    model: torch.nn.Module,
+    mix: torch.Tensor,
+    shifts: int = 1,
+    overlap: float = 0.25,
+    segment: Optional[float] = None,
+    batch_size: int = 4,
+    device: Optional[Union[str, torch.device]] = None,
+    transition_power: float = 1.0,
+    amp: bool = False,
+    buffer: Optional[OverlapAddBuffer] = None,
+) -> Iterator[torch.Tensor]:
+    """Separate ``mix`` (``batch x channels x length``) block by block.
+
+    Yields consecutive, non-overlapping blocks of shape
+    ``batch x sources x channels x block_length`` on ``mix.device`` that
+    together cover the whole input. Bags of models, the shift trick and the
+    segment/overlap settings behave like ``apply_model(..., split=True)``, but
+    up to ``batch_size`` segments are evaluated per forward pass and host
+    memory stays proportional to the segment size rather than the track
+    length.
+
+    With ``amp`` enabled the forward passes on CUDA run under float16
+    autocast, which roughly halves activation memory for the transformer
+    models. Merging the segments always happens in float32.
+
+    Passing the same :class:`OverlapAddBuffer` to consecutive calls keeps the
+    merge window allocated between tracks instead of reallocating it.
+    """
+
+    assert transition_power >= 1, "transition_power < 1 leads to weird behavior."
+    device = torch.device(device) if device is not None else mix.device
+    models, model_weights = _unpack_bag(model)
+    for sub_model in models:
+        sub_model.to(device)
+        sub_model.eval()
+
+    batch, channels, length = mix.shape
+    if segment is None:
+        segment = min(float(sub_model.segment) for sub_model in models)
+    segment_length = int(model.samplerate * segment)
+    stride = int((1 - overlap) * segment_length)
+    # Extra context each model wants around a segment, split evenly.
+    valid_lengths = [_valid_length(sub_model, segment_length) for sub_model in models]
+    contexts = [(valid - segment_length) // 2 for valid in valid_lengths]
+
+    # Shift trick: every shift uses the same segment grid delayed by a random
+    # amount, and the per-shift estimates are averaged.
+    max_shift = int(0.5 * model.samplerate) if shifts else 0
+    delays = [random.randint(0, max_shift) for _ in range(shifts)] if shifts else [0]
+    grid_sizes = [math.ceil((length + delay) / stride) for delay in delays]
+
+    # Pad once so that every model input is a plain window of the same tensor.
+    pad_left = max_shift + max(contexts)
+    padded = F.pad(mix, (pad_left, max(valid_lengths) + stride))
+
+    # Triangle shaped weight with its maximum in the middle of the segment.
+    weight = torch.cat(
+        [
+            torch.arange(1, segment_length // 2 + 1, device=device),
+            torch.arange(segment_length - segment_length // 2, 0, -1, device=device),
+        ]
+    )
+    weight = (weight / weight.max()) ** transition_power
+    host_weight = weight.to(mix.device)
+
+    # Mixed precision is only worth it on CUDA; CPU bfloat16 is emulated on
+    # most consumer processors and ends up slower than float32.
+    use_amp = amp and device.type == "cuda"
+
+    # Jobs are ordered by segment position so that finished regions can be
+    # released early: ``(row, shift, item)``.
+    jobs = [
+        (row, shift, item)
+        for row in range(max(grid_sizes))
+        for shift in range(len(delays))
+        if row < grid_sizes[shift]
+        for item in range(batch)
+    ]
+
+    rows_per_batch = batch_size // (len(delays) * batch) + 2
+    window = _RollingSum(
+        shape=(len(delays), batch, len(model.sources), channels),
+        length=rows_per_batch * stride + segment_length + max_shift,
+        device=mix.device,
+        buffer=buffer,
+    )
+
+    for start in range(0, len(jobs), batch_size):
+        chunk = jobs[start : start + batch_size]
+        seg_starts = [row * stride - delays[shift] for row, shift, _ in chunk]
+        predictions: Union[float, torch.Tensor] = 0.0
+        for sub_model, weights, valid, context in zip(
+            models, model_weights, valid_lengths, contexts
+        ):
+            offset = pad_left - context
+            inputs = torch.stack(
+                [
+                    padded[item, :, offset + seg_start : offset + seg_start + valid]
+                    for seg_start, (_, _, item) in zip(seg_starts, chunk)
+                ]
+            ).to(device)
+            with torch.inference_mode(), _autocast(device, use_amp):
+                out = sub_model(inputs)
+            out = out[..., context : context + segment_length].float()
+            predictions = predictions + out * weights.to(device)[:, None, None]
+        assert isinstance(predictions, torch.Tensor)
+        predictions = (predictions * weight).to(mix.device)
+
+        for (_, shift, item), seg_start, prediction in zip(chunk, seg_starts, predictions):
+            lo = max(seg_start, 0)
+            hi = min(seg_start + segment_length, length)
+            window.add((shift, item), lo, prediction[..., lo - seg_start : hi - seg_start])
+            if item == 0:
+                window.add_weight(shift, lo, host_weight[lo - seg_start : hi - seg_start])
+
+        # Everything before the first segment of the next row is final.
+        last_row, _, _ = chunk[-1]
+        next_job = start + batch_size
+        done_row = last_row if next_job >= len(jobs) or jobs[next_job][0] > last_row else last_row - 1
+        ready = length if next_job >= len(jobs) else (done_row + 1) * stride - max(delays)
+        ready = min(ready, length)
+        if ready > window.base:
+            yield window.pop(ready)
+
+
+def apply_vectorized(
+    model: torch.nn.Module,
+    mix: torch.Tensor,
+    shifts: int = 1,
+    overlap: float = 0.25,
+    segment: Optional[float] = None,
+    batch_size: int = 4,
+    device: Optional[Union[str, torch.device]] = None,
+    transition_power: float = 1.0,
+    amp: bool = False,
+    buffer: Optional[OverlapAddBuffer] = None,
+) -> torch.Tensor:
+    """Full-length variant of :func:`iter_vectorized`.
+
+    Returns a tensor of shape ``batch x sources x channels x length``.
+    """
+
+    blocks = iter_vectorized(
+        model,
+        mix,
+        shifts=shifts,
+        overlap=overlap,
+        segment=segment,
+        batch_size=batch_size,
+        device=device,
+        transition_power=transition_power,
+        amp=amp,
+        buffer=buffer,
+    )
+    return torch.cat(list(blocks), dim=-1)
+
+
+class OverlapAddBuffer:
+    """Reusable storage for the overlap-add window of :func:`iter_vectorized`.
+
+    The storage grows to the largest window requested and is zeroed in place
+    on every use. An instance must not be shared by two separations running
+    at the same time.
+    """
+
+    def __init__(self) -> None:
+        self._values: Optional[torch.Tensor] = None
+        self._weights: Optional[torch.Tensor] = None
+
+    def take(
+        self, shape: tuple[int, ...], length: int, device: torch.device
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Return zeroed ``values`` (``shape + (length,)``) and ``weights`` views."""
+
+        self._values = _grow(self._values, math.prod(shape) * length, device)
+        self._weights = _grow(self._weights, shape[0] * length, device)
+        values = self._values[: math.prod(shape) * length].view(*shape, length)
+        weights = self._weights[: shape[0] * length].view(shape[0], length)
+        return values.zero_(), weights.zero_()
+
+
+class _RollingSum:
+    """Overlap-add accumulator covering ``[base, base + length)``.
+
+    Holds one weighted sum per shift/batch item plus the matching sum of
+    weights per shift. :meth:`pop` normalises and averages the finished prefix
+    and slides the window forward.
+    """
+
+    def __init__(
+        self,
+        shape: tuple[int, ...],
+        length: int,
+        device: torch.device,
+        buffer: Optional[OverlapAddBuffer] = None,
+    ) -> None:
+        self.base = 0
+        self.buffer = buffer
+        self.values, self.weights = self._allocate(shape, length, device)
+
+    def add(self, index: tuple[int, int], start: int, values: torch.Tensor) -> None:
+        begin = start - self.base
+        self._reserve(begin + values.shape[-1])
+        self.values[index][..., begin : begin + values.shape[-1]] += values
+
+    def add_weight(self, shift: int, start: int, weight: torch.Tensor) -> None:
+        begin = start - self.base
+        self._reserve(begin + weight.shape[-1])
+        self.weights[shift, begin : begin + weight.shape[-1]] += weight
+
+    def pop(self, end: int) -> torch.Tensor:
+        size = end - self.base
+        block = (self.values[..., :size] / self.weights[:, None, None, None, :size]).mean(dim=0)
+
+        remaining = self.values.shape[-1] - size
+        self.values[..., :remaining] = self.values[..., size:].clone()
+        self.values[..., remaining:] = 0
+        self.weights[:, :remaining] = self.weights[:, size:].clone()
+        self.weights[:, remaining:] = 0
+        self.base = end
+        return block
+
+    def _reserve(self, size: int) -> None:
+        current = self.values.shape[-1]
+        if size <= current:
+            return
+        # The new views may alias the old ones inside a shared buffer.
+        values, weights = self.values.clone(), self.weights.clone()
+        self.values, self.weights = self._allocate(tuple(values.shape[:-1]), size, values.device)
+        self.values[..., :current] = values
+        self.weights[:, :current] = weights
+
+    def _allocate(
+        self, shape: tuple[int, ...], length: int, device: torch.device
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if self.buffer is not None:
+            return self.buffer.take(shape, length, device)
+        return torch.zeros(*shape, length, device=device), torch.zeros(shape[0], length, device=device)
+
+
+def _grow(storage: Optional[torch.Tensor], size: int, device: torch.device) -> torch.Tensor:
+    if storage is None or storage.device != device or storage.numel() < size:
+        return torch.empty(size, device=device)
+    return storage
+
+
+def _unpack_bag(model: torch.nn.Module) -> tuple[list[torch.nn.Module], list[torch.Tensor]]:
+    """Return the sub-models and their per-source weights (normalised)."""
+
+    if not isinstance(model, BagOfModels):
+        return [model], [torch.ones(len(model.sources))]
+
+    weights = torch.tensor(model.weights, dtype=torch.float32)
+    weights = weights / weights.sum(dim=0)
+    return list(model.models), list(weights)
+
+
+def _autocast(device: torch.device, enabled: bool) -> contextlib.AbstractContextManager:
+    if not enabled:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device.type, dtype=torch.float16)
+
+
+def _valid_length(model: torch.nn.Module, segment_length: int) -> int:
+    if isinstance(model, HTDemucs):
+        return segment_length
+    if hasattr(model, "valid_length"):
+        return model.valid_length(segment_length)
+    return segment_length
+
+
+__all__ = ["OverlapAddBuffer", "apply_vectorized", "iter_vectorized"]
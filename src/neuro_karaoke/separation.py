@@ -1,29 +1,108 @@
 """Utilities for splitting songs into vocal and instrumental stems with Demucs.
 
-The module exposes a small wrapper around the official Demucs CLI so the rest
-of the NeuroKaraoke codebase can work with a straightforward Python API
-without having to duplicate complex CLI calls each time.
+The module exposes a small wrapper around the Demucs Python API so the rest of
+the NeuroKaraoke codebase can work with a straightforward interface. The model
+is loaded once and stays resident on the selected device between tracks, which
+avoids paying the interpreter/CUDA start-up and weight loading cost per song.
 """
 
 from __future__ import annotations
 
 import argparse
+import contextlib
+import functools
 import logging
 import os
+import queue
 import shutil
 import subprocess
-import sys
+import weakref
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, Sequence
 
-try:
-    import torch  # type: ignore
-except ImportError:  # pragma: no cover - torch is installed with demucs.
-    torch = None
+import soundfile as sf
+import torch
+import torchaudio
+from demucs.apply import BagOfModels
+from demucs.audio import AudioFile, convert_audio
+from demucs.htdemucs import HTDemucs
+from demucs.pretrained import get_model
+
+from .inference import OverlapAddBuffer, iter_vectorized
 
 LOGGER = logging.getLogger(__name__)
 
+# Bitrate range that libsndfile spreads ``compression_level`` over for MP3.
+_MP3_MAX_BITRATE = 320
+_MP3_MIN_BITRATE = 32
+
+# Compiled models that already ran their warm-up; the models themselves are
+# shared between separators through ``_load_model``.
+_WARMED_UP: weakref.WeakSet[torch.nn.Module] = weakref.WeakSet()
+
+
+@functools.lru_cache(maxsize=1)
+def _auto_device() -> str:
+    """Probe CUDA once per process; the first probe initialises the driver."""
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@functools.lru_cache(maxsize=4)
+def _load_model(model_name: str, device: str, compile_model: bool = False) -> torch.nn.Module:
+    """Load a pretrained Demucs model once per ``(model_name, device, compile_model)``.
+
+    Every :class:`DemucsSeparator` shares the returned module, so creating
+    several separators (e.g. one per request) neither reloads the weights
+    from disk nor duplicates them in VRAM. Pass all three arguments
+    positionally: ``lru_cache`` keys ``f(a, b)`` and ``f(a, b, False)``
+    separately. To release the memory call
+    ``_load_model.cache_clear()`` followed by ``torch.cuda.empty_cache()``.
+    """
+
+    LOGGER.info("Loading Demucs model '%s' on %s", model_name, device)
+    model = get_model(model_name)
+    model.to(device)
+    model.eval()
+    if compile_model:
+        if not hasattr(torch.nn.Module, "compile"):
+            LOGGER.warning("torch.compile needs PyTorch >= 2.2, running the model eagerly")
+            return model
+        # Compile in place so the modules keep their Demucs attributes and
+        # types; CUDA graphs cut the per-segment kernel launch overhead.
+        mode = "reduce-overhead" if device.startswith("cuda") else None
+        sub_models = model.models if isinstance(model, BagOfModels) else [model]
+        for sub_model in sub_models:
+            sub_model.compile(mode=mode)
+    return model
+
+
+def _max_segment(model: torch.nn.Module) -> float:
+    """Longest segment in seconds ``model`` accepts (transformer models have a limit)."""
+
+    if isinstance(model, HTDemucs):
+        return float(model.segment)
+    if isinstance(model, BagOfModels):
+        return model.max_allowed_segment
+    return float("inf")
+
+
+def _load_audio(input_path: Path, model: torch.nn.Module) -> torch.Tensor:
+    """Decode ``input_path`` at the sample rate and channel count of ``model``."""
+
+    try:
+        return AudioFile(input_path).read(
+            streams=0,
+            samplerate=model.samplerate,
+            channels=model.audio_channels,
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError) as exc:
+        # Same fallback as the Demucs CLI when ffmpeg is missing or fails.
+        LOGGER.debug("ffmpeg could not read %s (%s), using torchaudio", input_path, exc)
+        wav, sample_rate = torchaudio.load(str(input_path))
+        return convert_audio(wav, sample_rate, model.samplerate, model.audio_channels)
+
 
 @dataclass(slots=True)
 class SeparationResult:
@@ -50,35 +129,48 @@ class DemucsSeparator:
         well on most tracks but users can experiment with others (`mdx_q`,
         `htdemucs_ft`, ...).
     device:
-        Optional device override. When omitted the class automatically selects
-        ``cuda`` if a GPU is available (torch must be installed) otherwise
-        ``cpu``.
+        Optional device override. When omitted the ``NEURO_KARAOKE_DEVICE``
+        environment variable is used if set, otherwise the class selects
+        ``cuda`` if a GPU is available and ``cpu`` otherwise.
     two_stems:
-        When provided, Demucs collapses all sources into two stems where the
-        primary source is defined by the flag (``vocals`` by default). This is a
-        great fit for karaoke since we only need the vocals and everything else.
+        Demucs collapses all sources into two stems where the primary source is
+        defined by the flag (``vocals`` by default). This is a great fit for
+        karaoke since we only need the vocals and everything else.
     segment:
         Optional window size (in seconds). Reducing this value allows Demucs to
         run on GPUs with less VRAM at the cost of a small quality loss.
     shifts:
         Enables the "shift trick" from Demucs for slightly cleaner stems at the
         expense of additional inference time.
-    jobs:
-        Number of files to process concurrently. Keep this at ``1`` when using
-        GPUs to avoid out-of-memory issues.
+    batch_size:
+        Number of overlapping segments evaluated per forward pass. Larger
+        batches keep the GPU busy and speed up separation noticeably; lower it
+        if you run out of VRAM.
+    amp:
+        Run the model under float16 autocast on CUDA. Cuts peak VRAM and speeds
+        up the transformer layers on recent GPUs; ignored on CPU.
     mp3/mp3_bitrate:
-        Save results as MP3 files instead of 44.1kHz wav. MP3s are lighter on
-        disk but require an extra encoding pass.
+        Save results as constant bitrate MP3 files instead of 44.1kHz wav.
+        They are encoded by libsndfile (>= 1.1) block by block while the stems
+        are being separated, so no ffmpeg round-trip is needed.
     float32:
-        Store wav files as ``float32`` instead of the default ``int16``.
-    keep_intermediate:
-        By default we clean the raw Demucs folders once the stems have been
-        copied to the final destination. Toggle this flag if you want to inspect
-        the unmodified Demucs layout for debugging.
+        Store wav files as ``float32`` instead of the default ``int16``. Float
+        stems keep peaks above full scale; ``int16`` stems clamp them.
+    compile_model:
+        Compile the model with ``torch.compile`` (PyTorch >= 2.2). Building the
+        graphs is slow, so a warm-up with one full batch of segments runs once
+        per loaded model. The last batch of a track usually holds fewer
+        segments; each such shape is compiled the first time it occurs, after
+        which tracks run faster.
     disable_cuda_cache:
         Mirrors the README recommendation to set the
         ``PYTORCH_NO_CUDA_MEMORY_CACHING`` env var. This can help keep VRAM
-        usage in check when using consumer GPUs.
+        usage in check when using consumer GPUs. When disabled, the caching
+        allocator is switched to expandable segments instead
+        (``PYTORCH_CUDA_ALLOC_CONF``), which avoids fragmentation when many tracks
+        are separated back to back. Both variables are read when CUDA
+        initialises, so they only apply if no CUDA tensor was created before
+        the separator.
     """
 
     def __init__(
@@ -89,11 +181,12 @@ class DemucsSeparator:
         two_stems: str = "vocals",
         segment: Optional[float] = None,
         shifts: int = 1,
-        jobs: int = 1,
+        batch_size: int = 4,
+        amp: bool = True,
         mp3: bool = False,
         mp3_bitrate: int = 320,
         float32: bool = False,
-        keep_intermediate: bool = False,
+        compile_model: bool = False,
         disable_cuda_cache: bool = True,
     ) -> None:
         self.output_root = Path(output_root)
@@ -104,15 +197,24 @@ class DemucsSeparator:
         self.two_stems = two_stems
         self.segment = segment
         self.shifts = shifts
-        self.jobs = jobs
+        self.batch_size = batch_size
+        self.amp = amp
         self.mp3 = mp3
         self.mp3_bitrate = mp3_bitrate
         self.float32 = float32
-        self.keep_intermediate = keep_intermediate
+        self.compile_model = compile_model
         self.disable_cuda_cache = disable_cuda_cache
 
-        self._work_dir = self.output_root / "_demucs_raw"
-        self._work_dir.mkdir(parents=True, exist_ok=True)
+        if self.disable_cuda_cache:
+            os.environ.setdefault("PYTORCH_NO_CUDA_MEMORY_CACHING", "1")
+        else:
+            os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
+        # Resolved on first use; the weights themselves are shared through
+        # ``_load_model`` between all separators with the same model/device.
+        self._model: Optional[torch.nn.Module] = None
+        # Overlap-add windows kept between tracks, one per concurrent separation.
+        self._buffers: queue.SimpleQueue[OverlapAddBuffer] = queue.SimpleQueue()
 
     # --------------------------------------------------------------------- API
     def separate_track(self, song_path: Path | str, overwrite: bool = False) -> SeparationResult:
@@ -128,144 +230,286 @@ class DemucsSeparator:
             the stems.
         """
 
-        input_path = Path(song_path).expanduser().resolve()
-        if not input_path.exists():
-            raise FileNotFoundError(f"Song not found: {input_path}")
+        return self.separate_tracks([song_path], overwrite=overwrite)[0]
 
-        target_dir = self.output_root / input_path.stem
-        if target_dir.exists():
-            if not overwrite:
-                raise FileExistsError(
-                    f"Stems for '{input_path.stem}' already exist. "
-                    "Pass overwrite=True to regenerate them."
-                )
-            shutil.rmtree(target_dir)
-        target_dir.mkdir(parents=True, exist_ok=True)
+    def separate_tracks(
+        self, song_paths: Sequence[Path | str], overwrite: bool = False
+    ) -> list[SeparationResult]:
+        """Split several songs, batching tracks of similar length together.
 
-        command = self._build_command(input_path)
-        env = os.environ.copy()
-        if self.disable_cuda_cache:
-            env["PYTORCH_NO_CUDA_MEMORY_CACHING"] = "1"
-
-        LOGGER.info("Running Demucs: %s", " ".join(command))
-        subprocess.run(command, check=True, env=env)
-
-        demucs_track_dir = self._resolve_demucs_track_dir(input_path)
-        vocals_path, instrumental_path = self._collect_stems(demucs_track_dir, target_dir)
-
-        if not self.keep_intermediate:
-            shutil.rmtree(demucs_track_dir)
-            model_dir = demucs_track_dir.parent
-            if not any(model_dir.iterdir()):
-                model_dir.rmdir()
-
-        return SeparationResult(
-            song_path=input_path,
-            vocals_path=vocals_path,
-            instrumental_path=instrumental_path,
-            output_dir=target_dir,
-            model_name=self.model_name,
-            device=self.device,
-        )
+        The songs are sorted by duration and separated in groups of
+        ``batch_size``: every group is zero padded to its longest track and
+        goes through the model in a single pass, so segments of different songs
+        share forward passes. Results are returned in the order of
+        ``song_paths``; ``overwrite`` behaves as in :meth:`separate_track`.
+        """
+
+        input_paths = [Path(song_path).expanduser().resolve() for song_path in song_paths]
+        for input_path in input_paths:
+            if not input_path.exists():
+                raise FileNotFoundError(f"Song not found: {input_path}")
+        names = [input_path.stem for input_path in input_paths]
+        if len(set(names)) != len(names):
+            raise ValueError("Several songs share the same file name; their stems would collide")
+
+        target_dirs = [self.output_root / name for name in names]
+        if not overwrite:
+            for name, target_dir in zip(names, target_dirs):
+                if target_dir.exists():
+                    raise FileExistsError(
+                        f"Stems for '{name}' already exist. "
+                        "Pass overwrite=True to regenerate them."
+                    )
+
+        model = self._get_model()
+        order = list(range(len(input_paths)))
+        if len(order) > 1:
+            order.sort(key=lambda index: _probe_duration(input_paths[index]))
+        group_size = max(1, self.batch_size)
+        results: dict[int, SeparationResult] = {}
+        for start in range(0, len(order), group_size):
+            group = order[start : start + group_size]
+            group_results = self._separate_group(
+                model,
+                [input_paths[index] for index in group],
+                [target_dirs[index] for index in group],
+            )
+            results.update(zip(group, group_results))
+        return [results[index] for index in range(len(input_paths))]
 
     # ----------------------------------------------------------------- Helpers
-    def _resolve_device(self, preferred: Optional[str]) -> str:
-        if preferred:
-            return preferred
-        if torch is not None and torch.cuda.is_available():
-            return "cuda"
-        return "cpu"
-
-    def _build_command(self, song_path: Path) -> list[str]:
-        command: list[str] = [
-            sys.executable,
-            "-m",
-            "demucs",
-            "--two-stems",
-            self.two_stems,
-            "-n",
-            self.model_name,
-            "-d",
-            self.device,
-            "--out",
-            str(self._work_dir),
-        ]
-
-        if self.segment:
-            command += ["--segment", str(self.segment)]
-        if self.shifts and self.shifts > 1:
-            command += ["--shifts", str(self.shifts)]
-        if self.jobs and self.jobs > 1:
-            command += ["-j", str(self.jobs)]
-        if self.mp3:
-            command += ["--mp3", "--mp3-bitrate", str(self.mp3_bitrate)]
-        if self.float32:
-            command.append("--float32")
-
-        command.append(str(song_path))
-        return command
-
-    def _resolve_demucs_track_dir(self, input_path: Path) -> Path:
-        model_dir = self._work_dir / self.model_name
-        if not model_dir.exists():
-            raise FileNotFoundError(
-                f"Demucs did not create the expected model directory: {model_dir}"
+    def _separate_group(
+        self,
+        model: torch.nn.Module,
+        input_paths: list[Path],
+        target_dirs: list[Path],
+    ) -> list[SeparationResult]:
+        wavs = [_load_audio(input_path, model) for input_path in input_paths]
+        lengths = [wav.shape[-1] for wav in wavs]
+        mix = torch.zeros(len(wavs), model.audio_channels, max(lengths))
+        stats = []
+        for index, wav in enumerate(wavs):
+            ref = wav.mean(0)
+            mean, std = ref.mean(), ref.std()
+            mix[index, :, : lengths[index]] = (wav - mean) / std
+            stats.append((mean, std))
+        del wavs
+
+        for input_path in input_paths:
+            LOGGER.info("Running Demucs (%s on %s): %s", self.model_name, self.device, input_path)
+
+        stem_index = model.sources.index(self.two_stems)
+        extension = ".mp3" if self.mp3 else ".wav"
+        results = []
+        with contextlib.ExitStack() as stack:
+            # Entered first so it exits last, once every stem file is closed.
+            staging_dirs = stack.enter_context(_staged_dirs(target_dirs))
+            blocks = iter_vectorized(
+                model,
+                mix,
+                shifts=self.shifts,
+                overlap=0.25,
+                segment=self.segment,
+                batch_size=self.batch_size,
+                device=self.device,
+                amp=self.amp,
+                buffer=stack.enter_context(self._overlap_buffer()),
             )
+            stem_files = []
+            for input_path, target_dir, staging_dir in zip(input_paths, target_dirs, staging_dirs):
+                vocals_path = target_dir / f"{input_path.stem}_vocals{extension}"
+                instrumental_path = target_dir / f"{input_path.stem}_instrumental{extension}"
+                stem_files.append(
+                    (
+                        stack.enter_context(
+                            self._open_stem(staging_dir / vocals_path.name, model)
+                        ),
+                        stack.enter_context(
+                            self._open_stem(staging_dir / instrumental_path.name, model)
+                        ),
+                    )
+                )
+                results.append(
+                    SeparationResult(
+                        song_path=input_path,
+                        vocals_path=vocals_path,
+                        instrumental_path=instrumental_path,
+                        output_dir=target_dir,
+                        model_name=self.model_name,
+                        device=self.device,
+                    )
+                )
 
-        candidate = model_dir / input_path.stem
-        if candidate.exists():
-            return candidate
+            # Write every block as soon as it is final so memory does not grow
+            # with the track length; padding past the end of a song is dropped.
+            offset = 0
+            for block in blocks:
+                for item, ((vocals_file, instrumental_file), length, (mean, std)) in enumerate(
+                    zip(stem_files, lengths, stats)
+                ):
+                    size = min(block.shape[-1], length - offset)
+                    if size <= 0:
+                        continue
+                    sources = block[item, ..., :size] * std + mean
+                    vocals = sources[stem_index]
+                    self._write_block(vocals_file, vocals)
+                    self._write_block(instrumental_file, sources.sum(dim=0) - vocals)
+                offset += block.shape[-1]
+
+        return results
+
+    @contextlib.contextmanager
+    def _overlap_buffer(self) -> Iterator[OverlapAddBuffer]:
+        try:
+            buffer = self._buffers.get_nowait()
+        except queue.Empty:
+            buffer = OverlapAddBuffer()
+        try:
+            yield buffer
+        finally:
+            self._buffers.put(buffer)
 
-        matches = sorted(model_dir.glob(f"{input_path.stem}*"))
-        if not matches:
-            raise FileNotFoundError(
-                f"Unable to locate Demucs output for '{input_path.name}' under {model_dir}"
+    def _resolve_device(self, preferred: Optional[str]) -> str:
+        return preferred or os.environ.get("NEURO_KARAOKE_DEVICE") or _auto_device()
+
+    def _get_model(self) -> torch.nn.Module:
+        if self._model is not None:
+            return self._model
+
+        model = _load_model(self.model_name, self.device, self.compile_model)
+        if self.two_stems not in model.sources:
+            raise ValueError(
+                f"Stem '{self.two_stems}' is not produced by {self.model_name}. "
+                f"Choose one of: {', '.join(model.sources)}"
             )
-        return matches[0]
 
-    def _collect_stems(self, demucs_track_dir: Path, dest_dir: Path) -> tuple[Path, Path]:
-        extension = ".mp3" if self.mp3 else ".wav"
+        max_segment = _max_segment(model)
+        if self.segment is not None and self.segment > max_segment:
+            raise ValueError(
+                f"{self.model_name} supports segments of at most {max_segment:.1f}s, "
+                f"got {self.segment}"
+            )
+
+        if self.compile_model and model not in _WARMED_UP:
+            self._warm_up(model)
+            _WARMED_UP.add(model)
+
+        self._model = model
+        return self._model
+
+    def _warm_up(self, model: torch.nn.Module) -> None:
+        # Silence for one full batch of segments and a partial one. Only the
+        # full batch is a shape every long track shares: the last batch of a
+        # track can hold anywhere from 1 to batch_size - 1 segments, and those
+        # shapes are compiled the first time they occur.
+        segment = self.segment
+        if segment is None:
+            sub_models = model.models if isinstance(model, BagOfModels) else [model]
+            segment = min(float(sub_model.segment) for sub_model in sub_models)
+        LOGGER.info("Compiling %s on %s, this may take a while", self.model_name, self.device)
+        silence = torch.zeros(1, model.audio_channels, int(model.samplerate * segment) * self.batch_size)
+        with self._overlap_buffer() as buffer:
+            for _ in iter_vectorized(
+                model,
+                silence,
+                shifts=0,
+                segment=segment,
+                batch_size=self.batch_size,
+                device=self.device,
+                amp=self.amp,
+                buffer=buffer,
+            ):
+                pass
+
+    def _open_stem(self, path: Path, model: torch.nn.Module) -> sf.SoundFile:
+        if self.mp3:
+            # libsndfile maps the level linearly onto 320 .. 32 kbps and rounds
+            # to the closest standard MP3 bitrate; it rejects exactly 1.0.
+            level = (_MP3_MAX_BITRATE - self.mp3_bitrate) / (_MP3_MAX_BITRATE - _MP3_MIN_BITRATE)
+            return sf.SoundFile(
+                path,
+                mode="w",
+                samplerate=model.samplerate,
+                channels=model.audio_channels,
+                format="MP3",
+                subtype="MPEG_LAYER_III",
+                compression_level=min(max(level, 0.0), 0.99),
+                bitrate_mode="CONSTANT",
+            )
+        return sf.SoundFile(
+            path,
+            mode="w",
+            samplerate=model.samplerate,
+            channels=model.audio_channels,
+            subtype="FLOAT" if self.float32 else "PCM_16",
+        )
 
-        vocals_source = demucs_track_dir / f"vocals{extension}"
-        if not vocals_source.exists():
-            raise FileNotFoundError(f"Expected vocals stem missing: {vocals_source}")
+    def _write_block(self, stem_file: sf.SoundFile, wav: torch.Tensor) -> None:
+        if self.float32 or self.mp3:
+            stem_file.write(wav.t().contiguous().numpy())
+            return
+        # Same int16 conversion as Demucs. The stem is never held in full, so
+        # peaks are clamped instead of rescaling the whole signal.
+        pcm = (wav * 2**15).clamp_(-(2**15), 2**15 - 1).short()
+        stem_file.write(pcm.t().contiguous().numpy())
 
-        accompaniment_source = self._find_instrumental_source(demucs_track_dir, extension)
 
-        vocals_dest = dest_dir / f"{demucs_track_dir.name}_vocals{extension}"
-        instrumental_dest = dest_dir / f"{demucs_track_dir.name}_instrumental{extension}"
+@contextlib.contextmanager
+def _staged_dirs(target_dirs: Sequence[Path]) -> Iterator[list[Path]]:
+    """Hidden folders that only replace ``target_dirs`` if the block succeeds.
 
-        shutil.move(vocals_source, vocals_dest)
-        shutil.move(accompaniment_source, instrumental_dest)
+    A failed or interrupted separation thus never leaves truncated stems
+    behind that a later run would mistake for finished ones.
+    """
 
-        return vocals_dest, instrumental_dest
+    staging_dirs = [
+        target_dir.with_name(f".{target_dir.name}.partial") for target_dir in target_dirs
+    ]
+    for staging_dir in staging_dirs:
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        staging_dir.mkdir(parents=True)
+    try:
+        yield staging_dirs
+    except BaseException:
+        for staging_dir in staging_dirs:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    for target_dir, staging_dir in zip(target_dirs, staging_dirs):
+        if target_dir.exists():
+            shutil.rmtree(target_dir)
+        staging_dir.replace(target_dir)
 
-    def _find_instrumental_source(self, demucs_track_dir: Path, extension: str) -> Path:
-        candidate_names = [f"no_{self.two_stems}", "accompaniment", "instrumental", "other"]
-        # When ``two_stems`` is not vocals Demucs still writes a file with that
-        # name, so we look for it as a fallback.
-        candidate_names.append(self.two_stems)
 
-        for name in candidate_names:
-            candidate = demucs_track_dir / f"{name}{extension}"
-            if candidate.exists():
-                return candidate
+def _probe_duration(path: Path) -> float:
+    """Best-effort duration in seconds, only used to group similar tracks."""
 
-        raise FileNotFoundError(
-            f"Could not determine the instrumental stem inside {demucs_track_dir}"
-        )
+    try:
+        return float(AudioFile(path).duration())
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        pass
+    try:
+        return sf.info(str(path)).duration
+    except RuntimeError:
+        return 0.0
 
 
 def _build_cli_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Split a song into vocal and instrumental stems using Demucs."
     )
-    parser.add_argument(
+    songs = parser.add_mutually_exclusive_group(required=True)
+    songs.add_argument(
         "--song",
-        required=True,
         type=Path,
         help="Path to the input song (e.g. assets/songs/track.mp3).",
     )
+    songs.add_argument(
+        "--songs",
+        nargs="+",
+        type=Path,
+        help="Several songs to separate in one run; similar lengths are batched together.",
+    )
     parser.add_argument(
         "--output-root",
         type=Path,
@@ -280,7 +524,7 @@ def _build_cli_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--device",
         default=None,
-        help="Device override (cpu/cuda). Leave empty for auto-detection.",
+        help="Device override (cpu/cuda). Leave empty to use NEURO_KARAOKE_DEVICE or auto-detection.",
     )
     parser.add_argument(
         "--segment",
@@ -295,10 +539,25 @@ def _build_cli_parser() -> argparse.ArgumentParser:
         help="Number of prediction shifts to average (>=1).",
     )
     parser.add_argument(
-        "--jobs",
+        "--batch-size",
         type=int,
-        default=1,
-        help="Number of files to separate in parallel.",
+        default=4,
+        help=(
+            "Number of segments evaluated per forward pass and of songs grouped "
+            "together with --songs (lower it on small GPUs)."
+        ),
+    )
+    parser.add_argument(
+        "--no-amp",
+        dest="amp",
+        action="store_false",
+        help="Run the model in float32 instead of float16 autocast on CUDA.",
+    )
+    parser.add_argument(
+        "--compile",
+        dest="compile_model",
+        action="store_true",
+        help="Compile the model with torch.compile (slow start, faster on many tracks).",
     )
     parser.add_argument(
         "--mp3",
@@ -316,11 +575,6 @@ def _build_cli_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Save wav files as float32 instead of int16.",
     )
-    parser.add_argument(
-        "--keep-intermediate",
-        action="store_true",
-        help="Do not delete the raw Demucs output directory.",
-    )
     parser.add_argument(
         "--overwrite",
         action="store_true",
@@ -348,20 +602,21 @@ def main() -> None:
         device=args.device,
         segment=args.segment,
         shifts=args.shifts,
-        jobs=args.jobs,
+        batch_size=args.batch_size,
+        amp=args.amp,
         mp3=args.mp3,
         mp3_bitrate=args.mp3_bitrate,
         float32=args.float32,
-        keep_intermediate=args.keep_intermediate,
+        compile_model=args.compile_model,
     )
 
-    result = separator.separate_track(args.song, overwrite=args.overwrite)
-
-    LOGGER.info(
-        "Done! Vocals: %s | Instrumental: %s",
-        result.vocals_path,
-        result.instrumental_path,
-    )
+    song_paths = args.songs or [args.song]
+    for result in separator.separate_tracks(song_paths, overwrite=args.overwrite):
+        LOGGER.info(
+            "Done! Vocals: %s | Instrumental: %s",
+            result.vocals_path,
+            result.instrumental_path,
+        )
 
 
 if __name__ == "__main__":  # pragma: no cover - CLI entry point.
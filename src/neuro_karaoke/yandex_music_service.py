@@ -8,18 +8,31 @@ retrieve lyrics with a single, well-typed API.
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+import functools
 import logging
 import re
 from pathlib import Path
 from typing import Optional
 
+import requests
+from requests.adapters import HTTPAdapter
 from yandex_music import Client, Track
 from yandex_music.download_info import DownloadInfo
-from yandex_music.exceptions import NotFoundError, YandexMusicError
+from yandex_music.exceptions import NetworkError, NotFoundError, YandexMusicError
+
+try:
+    import diskcache  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency.
+    diskcache = None
 
 LOGGER = logging.getLogger(__name__)
 
+_DOWNLOAD_CHUNK_SIZE = 1 << 16
+_DOWNLOAD_TIMEOUT = 30
+_LYRICS_CACHE_TTL = 7 * 24 * 60 * 60
+
 
 @dataclass(slots=True)
 class TrackChoice:
@@ -70,12 +83,30 @@ class LyricsPayload:
 
 
 class YandexMusicService:
-    """High level API for searching and downloading Yandex Music tracks."""
+    """High level API for searching and downloading Yandex Music tracks.
+
+    Search results are memoised per service instance. Lyrics are cached on
+    disk for a week under ``lyrics_cache_dir`` when the optional ``diskcache``
+    package is installed; pass ``None`` to disable that cache.
+    """
 
     _filename_pattern = re.compile(r"[^\w\s-]", re.UNICODE)
+    # ASCII equivalent of ``_filename_pattern`` for ``str.translate``.
+    _filename_translation = {
+        code: None
+        for code in range(128)
+        if not (chr(code).isalnum() or chr(code).isspace() or chr(code) in "_-")
+    }
     _lrc_tag_pattern = re.compile(r"\[(\d{1,2}):(\d{1,2})(?:\.(\d{1,3}))?]")
 
-    def __init__(self, token: str) -> None:
+    # Keep-alive connections kept per host for audio downloads.
+    _http_pool_size = 8
+
+    def __init__(
+        self,
+        token: str,
+        lyrics_cache_dir: Optional[Path | str] = ".cache/lyrics",
+    ) -> None:
         token = (token or "").strip()
         if not token:
             raise ValueError("Yandex Music token is empty")
@@ -83,14 +114,93 @@ class YandexMusicService:
         self.token = token
         self.client = Client(token).init()
 
+        self._search_cached = functools.lru_cache(maxsize=512)(self._search_uncached)
+        self._lyrics_cache = None
+        if lyrics_cache_dir is not None and diskcache is not None:
+            self._lyrics_cache = diskcache.Cache(str(lyrics_cache_dir))
+
+        # Shared session so consecutive/concurrent downloads reuse sockets.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._http_pool_size,
+            pool_maxsize=self._http_pool_size,
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
     # --------------------------------------------------------------------- API
     def search_tracks(self, query: str, limit: int = 10) -> list[TrackChoice]:
         if not query.strip():
             return []
+        return list(self._search_cached(query, limit))
+
+    def download_track(self, track_id: str, destination_dir: Path | str) -> tuple[Path, Track]:
+        track = self._fetch_track(track_id)
+        destination_dir = Path(destination_dir)
+        destination_dir.mkdir(parents=True, exist_ok=True)
+
+        safe_name = self._sanitize_filename(f"{track.title or 'track'}_{track.id}")
+        file_path = destination_dir / f"{safe_name}.mp3"
+
+        download_info = self._pick_download_info(track.id)
+        self._stream_to_file(download_info, file_path)
+
+        return file_path, track
+
+    def download_tracks(
+        self,
+        track_ids: list[str],
+        destination_dir: Path | str,
+        concurrency: int = 8,
+    ) -> list[tuple[Path, Track]]:
+        """Download several tracks in parallel, preserving the input order.
+
+        Transfers release the GIL, so a small thread pool sharing the keep-alive
+        session is enough to keep the link busy instead of waiting on round
+        trips one track at a time. ``concurrency`` is capped at the session's
+        connection pool, since extra workers would only open throwaway
+        connections. Repeated ids are downloaded once.
+        """
+
+        unique_ids = list(dict.fromkeys(track_ids))
+        workers = min(max(1, concurrency), self._http_pool_size)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            downloads = dict(
+                zip(
+                    unique_ids,
+                    pool.map(lambda track_id: self.download_track(track_id, destination_dir), unique_ids),
+                )
+            )
+        return [downloads[track_id] for track_id in track_ids]
+
+    def download_track_with_lyrics(
+        self,
+        track_id: str,
+        destination_dir: Path | str,
+    ) -> tuple[Path, Track, Optional[LyricsPayload]]:
+        path, track = self.download_track(track_id, destination_dir)
+        lyrics = self.fetch_lyrics(track.id)
+        return path, track, lyrics
+
+    def fetch_lyrics(self, track_id: str) -> Optional[LyricsPayload]:
+        """Get synced lyrics when possible, otherwise plain text."""
+
+        cache_key = str(track_id)
+        if self._lyrics_cache is not None:
+            cached = self._lyrics_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
+        lyrics = self._fetch_lyrics_uncached(track_id)
+        if lyrics is not None and self._lyrics_cache is not None:
+            self._lyrics_cache.set(cache_key, lyrics, expire=_LYRICS_CACHE_TTL)
+        return lyrics
+
+    # ----------------------------------------------------------------- Helpers
+    def _search_uncached(self, query: str, limit: int) -> tuple[TrackChoice, ...]:
         search = self.client.search(query, type_="track")
         if not search or not search.tracks or not search.tracks.results:
-            return []
+            return ()
 
         normalized: list[TrackChoice] = []
         for track in search.tracks.results[:limit]:
@@ -113,34 +223,9 @@ class YandexMusicService:
                 )
             )
 
-        return normalized
-
-    def download_track(self, track_id: str, destination_dir: Path | str) -> tuple[Path, Track]:
-        track = self._fetch_track(track_id)
-        destination_dir = Path(destination_dir)
-        destination_dir.mkdir(parents=True, exist_ok=True)
-
-        safe_name = self._sanitize_filename(f"{track.title or 'track'}_{track.id}")
-        file_path = destination_dir / f"{safe_name}.mp3"
-
-        download_info = self._pick_download_info(track.id)
-        audio_bytes = download_info.download_bytes()
-        file_path.write_bytes(audio_bytes)
-
-        return file_path, track
-
-    def download_track_with_lyrics(
-        self,
-        track_id: str,
-        destination_dir: Path | str,
-    ) -> tuple[Path, Track, Optional[LyricsPayload]]:
-        path, track = self.download_track(track_id, destination_dir)
-        lyrics = self.fetch_lyrics(track.id)
-        return path, track, lyrics
-
-    def fetch_lyrics(self, track_id: str) -> Optional[LyricsPayload]:
-        """Get synced lyrics when possible, otherwise plain text."""
+        return tuple(normalized)
 
+    def _fetch_lyrics_uncached(self, track_id: str) -> Optional[LyricsPayload]:
         try:
             lrc = self.client.tracks_lyrics(track_id, format="LRC")
             if lrc:
@@ -170,7 +255,6 @@ class YandexMusicService:
 
         return None
 
-    # ----------------------------------------------------------------- Helpers
     def _fetch_track(self, track_id: str) -> Track:
         response = self.client.tracks(track_id)
         if not response:
@@ -184,29 +268,55 @@ class YandexMusicService:
 
         return max(infos, key=lambda info: info.bitrate_in_kbps or 0)
 
+    def _stream_to_file(self, download_info: DownloadInfo, file_path: Path) -> None:
+        url = download_info.direct_link or download_info.get_direct_link()
+        partial_path = file_path.with_name(f"{file_path.name}.part")
+        try:
+            with self._session.get(
+                url,
+                stream=True,
+                timeout=_DOWNLOAD_TIMEOUT,
+                proxies=self.client.request.proxies,
+            ) as response:
+                response.raise_for_status()
+                with open(partial_path, "wb") as file:
+                    for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+        except requests.RequestException as exc:
+            partial_path.unlink(missing_ok=True)
+            raise NetworkError(exc) from exc
+        partial_path.replace(file_path)
+
     def _sanitize_filename(self, name: str) -> str:
-        name = self._filename_pattern.sub("", name)
-        name = re.sub(r"\s+", "_", name.strip())
+        if name.isascii():
+            name = name.translate(self._filename_translation)
+        else:
+            name = self._filename_pattern.sub("", name)
+        name = "_".join(name.split())
         return name or "track"
 
     def _parse_lrc(self, raw_lrc: str) -> list[KaraokeLine]:
         cues: list[KaraokeLine] = []
+        in_order = True
+        previous = -1.0
         for line in raw_lrc.splitlines():
-            tags = list(self._lrc_tag_pattern.finditer(line))
-            if not tags:
+            if "[" not in line:
+                continue
+            # A single regex pass per line: ``split`` interleaves the text
+            # around the tags with the captured minutes/seconds/millis.
+            parts = self._lrc_tag_pattern.split(line)
+            if len(parts) == 1:
                 continue
-            lyric_text = self._lrc_tag_pattern.sub("", line).strip()
-            if not lyric_text:
-                lyric_text = "..."
-            for match in tags:
-                minutes = int(match.group(1))
-                seconds = int(match.group(2))
-                millis = (match.group(3) or "0").ljust(3, "0")
-                fractional = int(millis)
-                timestamp = minutes * 60 + seconds + fractional / 1000
+            lyric_text = "".join(parts[::4]).strip() or "..."
+            for minutes, seconds, millis in zip(parts[1::4], parts[2::4], parts[3::4]):
+                timestamp = int(minutes) * 60 + int(seconds) + int((millis or "0").ljust(3, "0")) / 1000
+                in_order = in_order and timestamp >= previous
+                previous = timestamp
                 cues.append(KaraokeLine(time=timestamp, text=lyric_text))
 
-        cues.sort(key=lambda cue: cue.time)
+        # Lines with several tags (repeated chorus) can put cues out of order.
+        if not in_order:
+            cues.sort(key=lambda cue: cue.time)
         return cues
 
 
@@ -2,17 +2,24 @@
 
 from __future__ import annotations
 
-import base64
 import json
 import os
+import shutil
 from html import escape
 from pathlib import Path
 from typing import Optional
+from urllib.parse import quote
 
 import pandas as pd
 import streamlit as st
 
-from neuro_karaoke.audio_utils import read_binary_audio
+try:
+    # SIMD base64 codec with the same interface as the standard module.
+    import pybase64 as base64  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency.
+    import base64
+
+from neuro_karaoke.audio_utils import map_binary_audio, read_binary_audio
 from neuro_karaoke.separation import DemucsSeparator, SeparationResult
 from neuro_karaoke.yandex_music_service import (
     KaraokeLine,
@@ -25,18 +32,32 @@ DOWNLOAD_DIR = Path("downloads")
 DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR = Path("outputs/separated")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+# Served by Streamlit under ``app/static/`` when ``server.enableStaticServing``
+# is on (see ``.streamlit/config.toml``); the folder must sit next to this script.
+STATIC_STEMS_DIR = Path(__file__).resolve().parent / "static" / "stems"
+# Streamlit's static route answers 404 for larger files.
+STATIC_FILE_MAX_BYTES = 200 * 1024 * 1024
 
 st.set_page_config(page_title="НейроКараоке", page_icon="🎤", layout="wide")
 
 
 def _init_state() -> None:
-    st.session_state.setdefault("ym_token", os.getenv("YANDEX_MUSIC_TOKEN", ""))
-    st.session_state.setdefault("search_results", [])
-    st.session_state.setdefault("selected_track_index", 0)
-    st.session_state.setdefault("downloaded_track_path", None)
-    st.session_state.setdefault("separation_result", None)
-    st.session_state.setdefault("lyrics_payload", None)
-    st.session_state.setdefault("track_metadata", None)
+    # Runs on every rerun; after the first one a single lookup is enough.
+    if st.session_state.get("_nk_inited"):
+        return
+    defaults = {
+        "ym_token": os.getenv("YANDEX_MUSIC_TOKEN", ""),
+        "search_results": [],
+        "selected_track_index": 0,
+        "downloaded_track_path": None,
+        "separation_result": None,
+        "lyrics_payload": None,
+        "track_metadata": None,
+    }
+    st.session_state.update(
+        {key: value for key, value in defaults.items() if key not in st.session_state}
+    )
+    st.session_state["_nk_inited"] = True
 
 
 @st.cache_resource(show_spinner=False)
@@ -50,33 +71,109 @@ def get_service(token: str) -> YandexMusicService:
 
 
 @st.cache_data(show_spinner=False)
-def get_audio_data_url(path: str, mtime: float) -> str:
-    """Return a data: URL for the provided audio file."""
+def _static_target(path: str) -> tuple[str, str]:
+    """Resolved ``path`` and its location relative to ``STATIC_STEMS_DIR``."""
+
+    source = Path(path).resolve()
+    return str(source), f"{source.parent.name}/{source.name}"
+
+
+def _is_published(target: Path, source: str, mtime: float) -> bool:
+    if target.is_symlink():
+        return os.readlink(target) == source
+    try:
+        return target.stat().st_mtime == mtime
+    except FileNotFoundError:
+        return False
+
+
+def get_static_audio_url(path: str, mtime: float) -> str:
+    """Expose an audio file through Streamlit's static file route.
+
+    The stem is symlinked (or copied where symlinks are unavailable) into the
+    static folder, so the browser fetches it over HTTP instead of receiving it
+    inline in the page. The link is checked on every call and recreated if the
+    static folder was cleaned. ``mtime`` doubles as a cache buster for the
+    browser.
+    """
+
+    source, relative = _static_target(path)
+    target = STATIC_STEMS_DIR / relative
+    if not _is_published(target, source, mtime):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.unlink(missing_ok=True)
+        try:
+            target.symlink_to(source)
+        except OSError:
+            shutil.copy2(source, target)
+    return f"app/static/stems/{quote(relative)}?v={int(mtime)}"
+
+
+# ``cache_resource`` hands back the cached object itself; ``cache_data`` would
+# unpickle a fresh copy of the whole stem on every hit.
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _get_bytes(path: str, mtime: float) -> bytes:
+    _ = mtime  # ensure Streamlit cache invalidates when file changes
+    return read_binary_audio(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_audio_data_url(path: str, mtime: float) -> bytes:
+    """Return an ASCII data: URL for the provided audio file.
+
+    Only used when static file serving is disabled: the whole file ends up
+    base64-encoded inside the page. The URL is cached as ``bytes``, which is
+    half the size of the equivalent ``str``; decode it when building the page.
+    """
 
     file_path = Path(path)
     _ = mtime  # ensure Streamlit cache invalidates when file changes
-    data = read_binary_audio(file_path)
-    encoded = base64.b64encode(data).decode("utf-8")
-    return f"data:audio/wav;base64,{encoded}"
+    with map_binary_audio(file_path) as data:
+        return b"data:audio/wav;base64," + base64.b64encode(data)
+
+
+def _serve_static(stat: os.stat_result) -> bool:
+    return st.get_option("server.enableStaticServing") and stat.st_size <= STATIC_FILE_MAX_BYTES
+
+
+def _audio_url(path: Path | str, stat: os.stat_result) -> str:
+    path = os.fspath(path)
+    if _serve_static(stat):
+        return get_static_audio_url(path, stat.st_mtime)
+    return get_audio_data_url(path, stat.st_mtime).decode("ascii")
+
+
+@st.cache_data(show_spinner=False)
+def _cues_json(cues: tuple[tuple[float, str], ...]) -> str:
+    """JSON of ``(time, text)`` cues for a ``<script type="application/json">`` block.
+
+    The output is pure ASCII and cannot close the script element, so it needs
+    no HTML escaping and the browser hands it to ``JSON.parse`` verbatim.
+    """
+
+    payload = [{"time": round(time, 3), "text": text} for time, text in cues]
+    return json.dumps(payload, ensure_ascii=True).replace("<", "\\u003c")
 
 
 def render_audio_player(
     instrumental_path: Path,
     vocals_path: Path,
     cues: list[KaraokeLine],
+    instrumental_stat: os.stat_result,
+    vocals_stat: os.stat_result,
 ) -> None:
-    """Custom HTML player that keeps playback running while changing levels."""
+    """Custom HTML player that keeps playback running while changing levels.
 
-    instrumental_path = Path(instrumental_path)
-    vocals_path = Path(vocals_path)
-    instrumental_url = get_audio_data_url(
-        str(instrumental_path), instrumental_path.stat().st_mtime
-    )
-    vocals_url = get_audio_data_url(str(vocals_path), vocals_path.stat().st_mtime)
+    Both stems are decoded once with the Web Audio API and played from the
+    same audio clock; the vocal level is a gain node, so there is nothing to
+    resynchronise.
+    """
+
+    instrumental_url = _audio_url(instrumental_path, instrumental_stat)
+    vocals_url = _audio_url(vocals_path, vocals_stat)
 
-    cues_payload = [{"time": round(c.time, 3), "text": c.text} for c in cues]
-    cues_json = escape(json.dumps(cues_payload, ensure_ascii=False))
-    initial_line = escape(cues_payload[0]["text"]) if cues_payload else "Тайм-коды недоступны"
+    cues_json = _cues_json(tuple((c.time, c.text) for c in cues))
+    initial_line = escape(cues[0].text) if cues else "Тайм-коды недоступны"
 
     html = f"""
     <style>
@@ -87,10 +184,39 @@ def render_audio_player(
         border-radius: 16px;
         box-shadow: 0 10px 40px rgba(15, 23, 42, 0.4);
     }}
-    .nk-player audio {{
-        width: 100%;
-        margin-bottom: 1rem;
-        outline: none;
+    .nk-transport {{
+        display: flex;
+        align-items: center;
+        gap: 0.8rem;
+        margin-bottom: 0.4rem;
+    }}
+    .nk-transport button {{
+        width: 2.6rem;
+        height: 2.6rem;
+        border: none;
+        border-radius: 50%;
+        background: #f97316;
+        color: #0f172a;
+        font-size: 1.1rem;
+        cursor: pointer;
+    }}
+    .nk-transport button:disabled {{
+        background: #475569;
+        cursor: wait;
+    }}
+    .nk-transport input[type=range] {{
+        flex: 1;
+    }}
+    #nk-time {{
+        font-variant-numeric: tabular-nums;
+        font-size: 0.9rem;
+        color: #cbd5e1;
+    }}
+    #nk-status {{
+        font-size: 0.8rem;
+        color: #94a3b8;
+        min-height: 1.2rem;
+        margin-bottom: 0.8rem;
     }}
     .nk-slider {{
         display: flex;
@@ -136,14 +262,16 @@ def render_audio_player(
         min-height: 2.5rem;
     }}
     </style>
-    <div class="nk-player" id="nk-player-root" data-cues='{cues_json}'>
-        <audio id="nk-audio" controls preload="auto">
-            <source src="{instrumental_url}" type="audio/wav" />
-            Ваш браузер не поддерживает аудио воспроизведение.
-        </audio>
-        <audio id="nk-vocals" preload="auto" style="display:none">
-            <source src="{vocals_url}" type="audio/wav" />
-        </audio>
+    <div class="nk-player"
+         id="nk-player-root"
+         data-instrumental-url="{escape(instrumental_url)}"
+         data-vocals-url="{escape(vocals_url)}">
+        <div class="nk-transport">
+            <button type="button" id="nk-play">▶</button>
+            <input type="range" id="nk-seek" min="0" max="0" step="0.01" value="0" disabled />
+            <span id="nk-time">0:00 / 0:00</span>
+        </div>
+        <div id="nk-status"></div>
         <div class="nk-slider">
             <label for="nk-vocal-slider">
                 Громкость вокала: <span id="nk-vocal-value">100%</span>
@@ -160,69 +288,176 @@ def render_audio_player(
             <div id="nk-karaoke-line">{initial_line}</div>
         </div>
     </div>
+    <script type="application/json" id="nk-cues">{cues_json}</script>
     <script>
     (function() {{
         const root = document.getElementById("nk-player-root");
         if (!root) return;
-        const cuesData = root.dataset.cues;
-        const cues = cuesData ? JSON.parse(cuesData) : [];
-        const audio = document.getElementById("nk-audio");
-        const vocals = document.getElementById("nk-vocals");
+        const cues = JSON.parse(document.getElementById("nk-cues").textContent);
+        const playButton = document.getElementById("nk-play");
+        const seekSlider = document.getElementById("nk-seek");
+        const timeEl = document.getElementById("nk-time");
+        const statusEl = document.getElementById("nk-status");
         const slider = document.getElementById("nk-vocal-slider");
         const valueEl = document.getElementById("nk-vocal-value");
         const lineEl = document.getElementById("nk-karaoke-line");
         const hasCues = cues.length > 0;
 
+        const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+        if (!AudioContextClass) {{
+            statusEl.textContent = "Ваш браузер не поддерживает Web Audio API.";
+            return;
+        }}
+        const ctx = new AudioContextClass();
+        const vocalGain = ctx.createGain();
+        vocalGain.connect(ctx.destination);
+
         const setLabel = (value) => {{
             valueEl.textContent = Math.round(value * 100) + "%";
         }};
 
-        const setVolume = (value) => {{
-            vocals.volume = value;
+        vocalGain.gain.value = parseFloat(slider.value);
+        setLabel(parseFloat(slider.value));
+
+        slider.addEventListener("input", (event) => {{
+            const value = parseFloat(event.target.value);
+            vocalGain.gain.setTargetAtTime(value, ctx.currentTime, 0.01);
             setLabel(value);
+        }});
+
+        const formatTime = (seconds) => {{
+            const whole = Math.floor(seconds);
+            return Math.floor(whole / 60) + ":" + String(whole % 60).padStart(2, "0");
         }};
 
-        setVolume(parseFloat(slider.value));
+        // Both stems start on the same context clock: ``offset`` is the song
+        // position at ``startedAt`` (context time) while playing.
+        let instrumentalBuffer = null;
+        let vocalsBuffer = null;
+        let duration = 0;
+        let sources = [];
+        let playing = false;
+        let offset = 0;
+        let startedAt = 0;
+        let dragging = false;
+
+        const position = () => (
+            playing ? Math.min(offset + ctx.currentTime - startedAt, duration) : offset
+        );
+
+        const stopSources = () => {{
+            sources.forEach((source) => {{
+                source.onended = null;
+                source.stop();
+            }});
+            sources = [];
+        }};
 
-        slider.addEventListener("input", (event) => {{
-            setVolume(parseFloat(event.target.value));
-        }});
+        const startSources = () => {{
+            const instrumental = ctx.createBufferSource();
+            instrumental.buffer = instrumentalBuffer;
+            instrumental.connect(ctx.destination);
+            const vocals = ctx.createBufferSource();
+            vocals.buffer = vocalsBuffer;
+            vocals.connect(vocalGain);
+            instrumental.onended = () => {{
+                stopSources();
+                playing = false;
+                offset = 0;
+                seekPending = true;
+                render();
+            }};
+            startedAt = ctx.currentTime;
+            instrumental.start(startedAt, offset);
+            vocals.start(startedAt, offset);
+            sources = [instrumental, vocals];
+            playing = true;
+        }};
 
-        const syncVocals = (force = false) => {{
-            if (!vocals.duration) return;
-            const diff = Math.abs(vocals.currentTime - audio.currentTime);
-            if (force || diff > 0.05) {{
-                try {{
-                    vocals.currentTime = audio.currentTime;
-                }} catch (err) {{
-                    console.warn("Sync error", err);
-                }}
-            }}
+        const render = () => {{
+            const current = position();
+            playButton.textContent = playing ? "⏸" : "▶";
+            timeEl.textContent = formatTime(current) + " / " + formatTime(duration);
+            if (!dragging) seekSlider.value = current;
+            if (hasCues) updateLyrics(current);
         }};
 
-        const playVocals = () => {{
-            syncVocals(true);
-            const promise = vocals.play();
-            if (promise) {{
-                promise.catch(() => {{}});
-            }}
+        // One DOM update per animation frame while playing.
+        const tick = () => {{
+            if (!playing) return;
+            render();
+            requestAnimationFrame(tick);
         }};
 
-        audio.addEventListener("play", playVocals);
-        audio.addEventListener("pause", () => vocals.pause());
-        audio.addEventListener("seeking", () => syncVocals(true));
-        audio.addEventListener("ratechange", () => {{
-            vocals.playbackRate = audio.playbackRate;
-            syncVocals(true);
+        playButton.addEventListener("click", () => {{
+            ctx.resume();
+            if (playing) {{
+                offset = position();
+                stopSources();
+                playing = false;
+                render();
+                return;
+            }}
+            ensureLoaded().then(() => {{
+                if (playing || !instrumentalBuffer) return;
+                startSources();
+                requestAnimationFrame(tick);
+            }});
+        }});
+
+        seekSlider.addEventListener("input", () => {{
+            dragging = true;
+            timeEl.textContent = formatTime(parseFloat(seekSlider.value)) + " / " + formatTime(duration);
         }});
-        audio.addEventListener("timeupdate", () => {{
-            syncVocals(false);
-            if (!hasCues) return;
-            updateLyrics(audio.currentTime);
+        seekSlider.addEventListener("change", () => {{
+            dragging = false;
+            offset = parseFloat(seekSlider.value);
+            seekPending = true;
+            if (playing) {{
+                stopSources();
+                startSources();
+            }}
+            render();
         }});
-        audio.addEventListener("ended", () => vocals.pause());
+
+        const loadStem = (url) => fetch(url)
+            .then((response) => {{
+                if (!response.ok) throw new Error("HTTP " + response.status);
+                return response.arrayBuffer();
+            }})
+            .then((data) => new Promise((resolve, reject) => ctx.decodeAudioData(data, resolve, reject)));
+
+        // Like preload="metadata": nothing is downloaded until the first play,
+        // so opening the page (or a rerun) does not pull both stems.
+        let loading = null;
+        const ensureLoaded = () => {{
+            if (loading) return loading;
+            statusEl.textContent = "Загрузка дорожек…";
+            playButton.disabled = true;
+            loading = Promise.all([loadStem(root.dataset.instrumentalUrl), loadStem(root.dataset.vocalsUrl)])
+                .then(([instrumental, vocals]) => {{
+                    instrumentalBuffer = instrumental;
+                    vocalsBuffer = vocals;
+                    duration = instrumental.duration;
+                    seekSlider.max = duration;
+                    seekSlider.disabled = false;
+                    statusEl.textContent = "";
+                }})
+                .catch((err) => {{
+                    console.warn("Stem loading error", err);
+                    statusEl.textContent = "Не удалось загрузить дорожки.";
+                    loading = null;
+                }})
+                .finally(() => {{
+                    playButton.disabled = false;
+                }});
+            return loading;
+        }};
 
         let lastIndex = -1;
+        // Set on seeks: the next update has to search instead of stepping.
+        let seekPending = false;
+
         const findCueIndex = (currentTime) => {{
             if (!cues.length) return 0;
             let left = 0;
@@ -240,8 +475,22 @@ def render_audio_player(
             return best;
         }};
 
+        // Playback only moves forward between seeks, so step from the last
+        // cue instead of searching on every tick.
+        const nextCueIndex = (currentTime) => {{
+            if (seekPending || lastIndex < 0 || currentTime < cues[lastIndex].time) {{
+                seekPending = false;
+                return findCueIndex(currentTime);
+            }}
+            let idx = lastIndex;
+            while (idx + 1 < cues.length && cues[idx + 1].time <= currentTime) {{
+                idx += 1;
+            }}
+            return idx;
+        }};
+
         const updateLyrics = (currentTime) => {{
-            const idx = findCueIndex(currentTime);
+            const idx = nextCueIndex(currentTime);
             if (idx !== lastIndex && cues[idx]) {{
                 lineEl.textContent = cues[idx].text;
                 lastIndex = idx;
@@ -257,22 +506,50 @@ def render_audio_player(
     st.components.v1.html(html, height=470)
 
 
+def _render_download(
+    container, label: str, path: Path | str, file_name: str, stat: os.stat_result
+) -> None:
+    """Download control for a stem.
+
+    With static serving the browser fetches the file straight from the static
+    route, so reruns never read the stem. ``st.download_button`` needs the
+    whole file as ``bytes`` (it rejects mmap/memoryview), so it is only the
+    fallback for when static serving is off or the stem is over its size limit.
+    """
+
+    path = os.fspath(path)
+    if _serve_static(stat):
+        url = get_static_audio_url(path, stat.st_mtime)
+        container.markdown(
+            f'<a href="{escape(url)}" download="{escape(file_name)}">⬇️ {escape(label)}</a>',
+            unsafe_allow_html=True,
+        )
+        return
+    container.download_button(
+        label,
+        data=_get_bytes(path, stat.st_mtime),
+        file_name=file_name,
+        mime="audio/wav",
+    )
+
+
 def _reuse_existing(separator: DemucsSeparator, song_path: Path) -> SeparationResult:
     target_dir = separator.output_root / song_path.stem
     if not target_dir.exists():
         raise FileNotFoundError(f"Existing stems for {song_path.stem} not found")
 
-    vocals_candidates = sorted(target_dir.glob("*_vocals.*"))
-    instrumental_candidates = sorted(target_dir.glob("*_instrumental.*"))
-    if not vocals_candidates or not instrumental_candidates:
+    # A separation writes one file per stem, so the first match is the one.
+    vocals_path = next(target_dir.glob("*_vocals.*"), None)
+    instrumental_path = next(target_dir.glob("*_instrumental.*"), None)
+    if vocals_path is None or instrumental_path is None:
         raise FileNotFoundError(
             f"Stems for {song_path.stem} exist but files are missing in {target_dir}"
         )
 
     return SeparationResult(
         song_path=song_path,
-        vocals_path=vocals_candidates[0],
-        instrumental_path=instrumental_candidates[0],
+        vocals_path=vocals_path,
+        instrumental_path=instrumental_path,
         output_dir=target_dir,
         model_name=separator.model_name,
         device=separator.device,
@@ -284,17 +561,16 @@ def _track_option_label(track: TrackChoice) -> str:
 
 
 def _render_track_table(results: list[TrackChoice]) -> None:
+    # Column-oriented input: pandas builds each column directly instead of
+    # inferring the schema row by row.
     table = pd.DataFrame(
-        [
-            {
-                "Название": track.title,
-                "Исполнители": track.artists,
-                "Альбом": track.album,
-                "Длительность": track.duration_str,
-                "Синхр. текст": "Да" if track.has_sync_lyrics else "—",
-            }
-            for track in results
-        ]
+        {
+            "Название": [track.title for track in results],
+            "Исполнители": [track.artists for track in results],
+            "Альбом": [track.album for track in results],
+            "Длительность": [track.duration_str for track in results],
+            "Синхр. текст": ["Да" if track.has_sync_lyrics else "—" for track in results],
+        }
     )
     st.dataframe(table, use_container_width=True, hide_index=True)
 
@@ -406,24 +682,32 @@ def main() -> None:
         else:
             st.caption("Текст не найден, но микшер доступен для прослушивания.")
 
+        # One stat per stem per rerun, shared by the player and the downloads.
+        instrumental_stat = os.stat(separation_result.instrumental_path)
+        vocals_stat = os.stat(separation_result.vocals_path)
+
         render_audio_player(
             separation_result.instrumental_path,
             separation_result.vocals_path,
             cues,
+            instrumental_stat,
+            vocals_stat,
         )
 
         col1, col2 = st.columns(2)
-        col1.download_button(
+        _render_download(
+            col1,
             "Скачать вокал",
-            data=read_binary_audio(separation_result.vocals_path),
-            file_name=f"{separation_result.song_path.stem}_vocals.wav",
-            mime="audio/wav",
+            separation_result.vocals_path,
+            f"{separation_result.song_path.stem}_vocals.wav",
+            vocals_stat,
         )
-        col2.download_button(
+        _render_download(
+            col2,
             "Скачать инструментал",
-            data=read_binary_audio(separation_result.instrumental_path),
-            file_name=f"{separation_result.song_path.stem}_instrumental.wav",
-            mime="audio/wav",
+            separation_result.instrumental_path,
+            f"{separation_result.song_path.stem}_instrumental.wav",
+            instrumental_stat,
         )
 
     if lyrics_payload:
@@ -0,0 +1,116 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("demucs")
+
+from demucs.apply import BagOfModels, apply_model
+
+from neuro_karaoke.inference import OverlapAddBuffer, _RollingSum, apply_vectorized
+
+SAMPLERATE = 100
+
+
+class _ConvModel(torch.nn.Module):
+    """Tiny stand-in for a Demucs model: one convolution per source."""
+
+    def __init__(self, seed: int, segment: float = 1.0) -> None:
+        super().__init__()
+        torch.manual_seed(seed)
+        self.samplerate = SAMPLERATE
+        self.audio_channels = 2
+        self.sources = ["drums", "vocals"]
+        self.segment = segment
+        self.conv = torch.nn.Conv1d(2, 4, kernel_size=5, padding=2)
+
+    def forward(self, mix: torch.Tensor) -> torch.Tensor:
+        batch, channels, length = mix.shape
+        return self.conv(mix).view(batch, len(self.sources), channels, length)
+
+
+def _reference(model: torch.nn.Module, mix: torch.Tensor) -> torch.Tensor:
+    return apply_model(model, mix, shifts=0, split=True, overlap=0.25, progress=False)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 4, 7])
+@pytest.mark.parametrize("length", [60, 100, 333, 1000])
+def test_matches_apply_model(batch_size: int, length: int) -> None:
+    model = _ConvModel(seed=0)
+    mix = torch.randn(1, 2, length)
+
+    out = apply_vectorized(model, mix, shifts=0, batch_size=batch_size)
+
+    assert out.shape == (1, 2, 2, length)
+    assert torch.allclose(out, _reference(model, mix), atol=1e-5)
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 5])
+def test_bag_of_models(batch_size: int) -> None:
+    bag = BagOfModels([_ConvModel(seed=0), _ConvModel(seed=1)], weights=[[1.0, 3.0], [2.0, 1.0]])
+    mix = torch.randn(1, 2, 480)
+
+    out = apply_vectorized(bag, mix, shifts=0, batch_size=batch_size)
+
+    assert torch.allclose(out, _reference(bag, mix), atol=1e-5)
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 8])
+def test_padded_batch_of_unequal_tracks(batch_size: int) -> None:
+    model = _ConvModel(seed=2)
+    lengths = [1000, 730, 60]
+    tracks = [torch.randn(1, 2, length) for length in lengths]
+    mix = torch.zeros(len(tracks), 2, max(lengths))
+    for index, track in enumerate(tracks):
+        mix[index, :, : track.shape[-1]] = track[0]
+
+    out = apply_vectorized(model, mix, shifts=0, batch_size=batch_size)
+
+    for index, track in enumerate(tracks):
+        expected = _reference(model, track)[0]
+        assert torch.allclose(out[index, ..., : track.shape[-1]], expected, atol=1e-5)
+
+
+def test_shared_buffer_across_calls() -> None:
+    model = _ConvModel(seed=3)
+    buffer = OverlapAddBuffer()
+    # Long then short then long again: the window shrinks, then has to grow
+    # past the storage left by the previous call.
+    for length, batch_size in [(900, 2), (60, 1), (1500, 6)]:
+        mix = torch.randn(1, 2, length)
+
+        out = apply_vectorized(model, mix, shifts=0, batch_size=batch_size, buffer=buffer)
+
+        assert torch.allclose(out, _reference(model, mix), atol=1e-5)
+
+
+def _used_buffer() -> OverlapAddBuffer:
+    # Storage left large by an earlier track: growing the window then hands
+    # out views that overlap the current ones.
+    buffer = OverlapAddBuffer()
+    buffer.take((1, 1, 2, 2), 1000, torch.device("cpu"))
+    return buffer
+
+
+@pytest.mark.parametrize(
+    "buffer", [None, OverlapAddBuffer(), _used_buffer()], ids=["none", "fresh", "used"]
+)
+def test_rolling_sum_grows_and_pops(buffer) -> None:
+    length = 60
+    spans = [(0, 25), (15, 40), (30, 60)]
+    values = torch.zeros(1, 1, 2, 2, length)
+    weights = torch.zeros(1, length)
+
+    # Start far too small so that every add has to grow the window.
+    window = _RollingSum(shape=(1, 1, 2, 2), length=4, device=torch.device("cpu"), buffer=buffer)
+    blocks = []
+    for (start, end), (next_start, _) in zip(spans, spans[1:] + [(length, None)]):
+        value = torch.randn(2, 2, end - start)
+        weight = torch.rand(end - start) + 0.5
+        window.add((0, 0), start, value)
+        window.add_weight(0, start, weight)
+        values[0, 0, ..., start:end] += value
+        weights[0, start:end] += weight
+        # Nothing after the start of the next span can change any more.
+        blocks.append(window.pop(next_start))
+
+    expected = (values / weights[:, None, None, None, :]).mean(dim=0)
+    assert torch.allclose(torch.cat(blocks, dim=-1), expected)
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("yandex_music")
+
+from neuro_karaoke.yandex_music_service import KaraokeLine, YandexMusicService
+
+
+def _parse_lrc(raw_lrc: str) -> list[KaraokeLine]:
+    # The parser only needs class attributes, so skip the API client login.
+    return YandexMusicService.__new__(YandexMusicService)._parse_lrc(raw_lrc)
+
+
+def test_parse_lrc_cr_line_endings():
+    cues = _parse_lrc("[00:01.00]a\r[00:02.00]b\r")
+
+    assert cues == [KaraokeLine(time=1.0, text="a"), KaraokeLine(time=2.0, text="b")]
+
+
+def test_parse_lrc_text_before_first_tag():
+    cues = _parse_lrc("text [00:03.00] mid")
+
+    assert cues == [KaraokeLine(time=3.0, text="text  mid")]
@@ -1,11 +1,22 @@
 """
 Модуль для отделения вокала от инструментала в аудиофайлах.
 Использует Demucs для разделения источников звука.
+
+Модель Demucs загружается один раз на процесс и остаётся в памяти
+(на выбранном устройстве) между вызовами, поэтому веса и CUDA-контекст
+не инициализируются заново для каждого трека.
 """
 
 from pathlib import Path
 from typing import Optional, Tuple
-import demucs.separate
+
+from demucs.apply import apply_model
+from demucs.audio import save_audio
+
+# Загрузка модели, чтение трека и проверка сегмента общие с пакетом:
+# модель кэшируется в одном месте, и веса не дублируются в памяти, если
+# процесс пользуется и этим модулем, и DemucsSeparator.
+from neuro_karaoke.separation import _auto_device, _load_audio, _load_model, _max_segment
 
 
 class VocalSeparator:
@@ -81,42 +92,8 @@ class VocalSeparator:
         if not audio_path.exists():
             raise FileNotFoundError(f"Аудиофайл не найден: {audio_path}")
         
-        # Подготовка аргументов для Demucs
-        args = [
-            "-n", self.model,
-            "--out", str(self.output_dir),
-        ]
-        
-        # Настройка устройства
-        if self.device:
-            args.extend(["-d", self.device])
-        
-        # Настройка сегментации (для управления памятью GPU)
-        if self.segment:
-            args.extend(["--segment", str(self.segment)])
-        
-        # Настройка сдвигов
-        if self.shifts > 1:
-            args.extend(["--shifts", str(self.shifts)])
-        
-        # Настройка перекрытия
-        if self.overlap != 0.25:
-            args.extend(["--overlap", str(self.overlap)])
-        
-        # Настройка формата вывода
-        if self.mp3:
-            args.append("--mp3")
-            args.extend(["--mp3-bitrate", str(self.mp3_bitrate)])
-        
-        if self.float32:
-            args.append("--float32")
-        
-        # Режим двух стемов (только вокал или только инструментал)
-        if two_stems:
-            args.extend(["--two-stems", two_stems])
-        
-        # Путь к аудиофайлу
-        args.append(str(audio_path))
+        output_subdir = output_subdir or audio_path.stem
+        model_output_dir = Path(self.output_dir) / self.model / output_subdir
         
         # Выполнение разделения
         print(f"Начинаю разделение: {audio_path.name}")
@@ -124,55 +101,15 @@ class VocalSeparator:
         print(f"Устройство: {self.device or 'автоопределение'}")
         
         try:
-            demucs.separate.main(args)
+            self._run_demucs(audio_path, model_output_dir, two_stems)
         except Exception as e:
             raise RuntimeError(f"Ошибка при разделении аудио: {e}")
         
-        # Определение путей к результатам
-        output_subdir = output_subdir or audio_path.stem
-        model_output_dir = Path(self.output_dir) / self.model / output_subdir
-        
-        # Определение путей к файлам
-        if two_stems == "vocals":
-            # В режиме two-stems создаются только vocals.wav и no_vocals.wav
-            vocals_path = model_output_dir / "vocals.wav"
-            if self.mp3:
-                vocals_path = model_output_dir / "vocals.mp3"
-            instrumental_path = model_output_dir / "no_vocals.wav"
-            if self.mp3:
-                instrumental_path = model_output_dir / "no_vocals.mp3"
-        else:
-            # В обычном режиме создаются все стемы (vocals, drums, bass, other)
-            vocals_path = model_output_dir / ("vocals.wav" if not self.mp3 else "vocals.mp3")
-            
-            # Инструментал = drums + bass + other
-            # Проверяем, существует ли уже no_vocals (если модель его создала)
-            instrumental_path = model_output_dir / ("no_vocals.wav" if not self.mp3 else "no_vocals.mp3")
-            
-            # Если файл no_vocals не существует, создаем его из других стемов
-            if not instrumental_path.exists():
-                drums_path = model_output_dir / ("drums.wav" if not self.mp3 else "drums.mp3")
-                bass_path = model_output_dir / ("bass.wav" if not self.mp3 else "bass.mp3")
-                other_path = model_output_dir / ("other.wav" if not self.mp3 else "other.mp3")
-                
-                if all(p.exists() for p in [drums_path, bass_path, other_path]):
-                    # Создадим инструментал, смешав стемы
-                    print("Смешиваю стемы для создания инструментала...")
-                    self._mix_stems(
-                        [drums_path, bass_path, other_path],
-                        instrumental_path
-                    )
-                else:
-                    # Если не все стемы найдены, попробуем найти хотя бы некоторые
-                    available_stems = [p for p in [drums_path, bass_path, other_path] if p.exists()]
-                    if available_stems:
-                        print(f"Найдены только некоторые стемы: {[p.name for p in available_stems]}")
-                        self._mix_stems(available_stems, instrumental_path)
-                    else:
-                        raise FileNotFoundError(
-                            f"Не найдены стемы для создания инструментала в {model_output_dir}. "
-                            f"Используйте two_stems='vocals' для автоматического создания."
-                        )
+        # Определение путей к файлам: в обоих режимах инструментал
+        # сохраняется как no_vocals (в полном режиме рядом лежат и все стемы)
+        ext = "mp3" if self.mp3 else "wav"
+        vocals_path = model_output_dir / f"vocals.{ext}"
+        instrumental_path = model_output_dir / f"no_vocals.{ext}"
         
         if not vocals_path.exists():
             raise FileNotFoundError(f"Файл вокала не найден: {vocals_path}")
@@ -186,60 +123,67 @@ class VocalSeparator:
         
         return str(vocals_path), str(instrumental_path)
     
-    def _mix_stems(self, stem_paths: list, output_path: Path):
+    def _run_demucs(self, audio_path: Path, model_output_dir: Path, two_stems: Optional[str]):
         """
-        Смешивает несколько стемов в один файл.
+        Разделяет трек моделью из кэша и сохраняет стемы так же, как CLI Demucs.
         
         Args:
-            stem_paths: Список путей к стемам для смешивания
-            output_path: Путь для сохранения результата
+            audio_path: Путь к входному аудиофайлу
+            model_output_dir: Директория для стемов
+            two_stems: Если указано, сохраняет этот стем и "no_<стем>" (сумму остальных),
+                иначе все стемы и no_vocals
         """
-        try:
-            import torch
-            import torchaudio
-            
-            # Загружаем все стемы
-            waveforms = []
-            sample_rate = None
-            
-            for stem_path in stem_paths:
-                waveform, sr = torchaudio.load(stem_path)
-                if sample_rate is None:
-                    sample_rate = sr
-                elif sr != sample_rate:
-                    # Ресемплируем если нужно
-                    resampler = torchaudio.transforms.Resample(sr, sample_rate)
-                    waveform = resampler(waveform)
-                
-                waveforms.append(waveform)
-            
-            # Смешиваем стемы
-            mixed = sum(waveforms)
-            
-            # Нормализуем чтобы избежать клиппинга
-            max_val = mixed.abs().max()
-            if max_val > 1.0:
-                mixed = mixed / max_val
-            
-            # Сохраняем результат
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            if output_path.suffix == '.mp3':
-                torchaudio.save(
-                    str(output_path),
-                    mixed,
-                    sample_rate,
-                    format='mp3',
-                    encoding='mp3',
-                    bitrate=f'{self.mp3_bitrate}k'
-                )
-            else:
-                torchaudio.save(str(output_path), mixed, sample_rate)
-                
-        except ImportError:
-            print("Предупреждение: torchaudio не установлен, используйте --two-stems=vocals для автоматического создания инструментала")
-            raise
-        except Exception as e:
-            raise RuntimeError(f"Ошибка при смешивании стемов: {e}")
+        device = self.device or _auto_device()
+        # Аргументы те же, что передаёт DemucsSeparator (lru_cache различает
+        # вызовы с разным набором аргументов)
+        model = _load_model(self.model, device, False)
+        
+        max_allowed_segment = _max_segment(model)
+        segment = self.segment or None
+        if segment is not None and segment > max_allowed_segment:
+            raise ValueError(
+                f"Сегмент {segment} с больше максимального для модели ({max_allowed_segment} с)"
+            )
+        if two_stems is not None and two_stems not in model.sources:
+            raise ValueError(f"Стем '{two_stems}' не поддерживается моделью: {', '.join(model.sources)}")
+        
+        wav = _load_audio(audio_path, model)
+        ref = wav.mean(0)
+        wav = (wav - ref.mean()) / ref.std()
+        sources = apply_model(
+            model,
+            wav[None],
+            device=device,
+            shifts=self.shifts,
+            split=True,
+            overlap=self.overlap,
+            segment=segment,
+        )[0]
+        sources = sources * ref.std() + ref.mean()
+        
+        ext = "mp3" if self.mp3 else "wav"
+        model_output_dir.mkdir(parents=True, exist_ok=True)
+        kwargs = {
+            'samplerate': model.samplerate,
+            'bitrate': self.mp3_bitrate,
+            'as_float': self.float32,
+        }
+        if two_stems is None:
+            # Полный режим: все стемы плюс инструментал для караоке
+            for source, name in zip(sources, model.sources):
+                save_audio(source, str(model_output_dir / f"{name}.{ext}"), **kwargs)
+            primary = "vocals" if "vocals" in model.sources else None
+        else:
+            primary = two_stems
+            index = model.sources.index(primary)
+            save_audio(sources[index], str(model_output_dir / f"{primary}.{ext}"), **kwargs)
+        
+        if primary is not None:
+            # Сумма остальных стемов (drums + bass + other) считается из тензоров
+            # в памяти, а не перечитыванием уже сохранённых файлов
+            index = model.sources.index(primary)
+            other = sources.sum(dim=0) - sources[index]
+            save_audio(other, str(model_output_dir / f"no_{primary}.{ext}"), **kwargs)
 
 
 def separate_vocals(